@@ -0,0 +1,48 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.urls import URLPattern
+from rest_framework.permissions import SAFE_METHODS
+
+
+def run_view(view, request, *args, **kwargs):
+    # Поток из пула живёт дольше запроса: соединение закрывается
+    # здесь же, как это делает обработчик для синхронных представлений.
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+run_read = sync_to_async(run_view, thread_sensitive=False)
+run_write = sync_to_async(run_view, thread_sensitive=True)
+
+
+def async_read_view(view):
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        # Чтение выполняется в общем пуле потоков и не ждёт другие
+        # запросы; запись остаётся в потоке запроса.
+        run = run_read if request.method in SAFE_METHODS else run_write
+        return await run(view, request, *args, **kwargs)
+
+    return async_view
+
+
+def async_read_patterns(patterns, names):
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_read_view(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        if pattern.name in names
+        else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,54 @@
+import hashlib
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from foodgram import constants
+
+User = get_user_model()
+
+# В кеше только поля для проверки доступа, без пароля и профиля;
+# остальные поля загружаются из БД при первом обращении. Порядок полей
+# модели: так значения передаются в from_db.
+CACHED_USER_FIELDS = [
+    field.attname
+    for field in User._meta.concrete_fields
+    if field.attname in ('id', 'is_active', 'is_staff')
+]
+
+
+def get_token_cache_key(key):
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_token_version(cache_key):
+    version = cache.get(cache_key)
+    if version is None:
+        cache.add(cache_key, time.time_ns(), constants.TOKEN_CACHE_TIMEOUT)
+        version = cache.get(cache_key)
+    return version
+
+
+def forget_tokens(*keys):
+    # Без версии следующий запрос получит новую, поэтому запись,
+    # сохранённая запросом, который начался до выхода, уже не читается.
+    cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        version_key = get_token_cache_key(key)
+        cache_key = f'{version_key}:{get_token_version(version_key)}'
+        values = cache.get(cache_key)
+        if values is not None:
+            user = User.from_db('default', CACHED_USER_FIELDS, values)
+            return user, self.get_model()(key=key, user=user)
+        user, token = super().authenticate_credentials(key)
+        cache.set(
+            cache_key,
+            [getattr(user, field) for field in CACHED_USER_FIELDS],
+            constants.TOKEN_CACHE_TIMEOUT,
+        )
+        return user, token
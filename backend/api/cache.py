@@ -0,0 +1,152 @@
+import hashlib
+import time
+from collections import Counter
+
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from foodgram import constants
+from foodgram.db.routers import primary_reads
+
+local_cache = {}
+response_cache_stats = Counter()
+
+
+def get_version(name):
+    key = f'{name}:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(*names):
+    versions = cache.get_many([f'{name}:version' for name in names])
+    return tuple(
+        versions.get(f'{name}:version') or get_version(name) for name in names
+    )
+
+
+def bump_version(name):
+    try:
+        cache.incr(f'{name}:version')
+    except ValueError:
+        cache.add(f'{name}:version', time.time_ns(), timeout=None)
+
+
+def bump_on_commit(*names):
+    def bump():
+        for name in names:
+            bump_version(name)
+
+    transaction.on_commit(bump)
+
+
+class CachedListMixin:
+    cache_name = None
+
+    def list(self, request, *args, **kwargs):
+        version = get_version(self.cache_name)
+        query = sorted(request.query_params.lists())
+        key = hashlib.md5(
+            f'{self.cache_name}:{version}:{query}'.encode()
+        ).hexdigest()
+        etag = f'"{key}"'
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (
+            etag in parse_etags(if_none_match) or if_none_match == '*'
+        ):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag}
+            )
+
+        expires, data = local_cache.get(key, (0, None))
+        if expires < time.monotonic():
+            data = cache.get(key)
+            if data is None:
+                with primary_reads():
+                    data = self.get_list_data()
+                cache.set(key, data, constants.REFERENCE_CACHE_TIMEOUT)
+            if len(local_cache) >= constants.REFERENCE_LOCAL_CACHE_SIZE:
+                local_cache.clear()
+            local_cache[key] = (
+                time.monotonic() + constants.REFERENCE_LOCAL_CACHE_TIMEOUT,
+                data,
+            )
+
+        return Response(data, headers={'ETag': etag})
+
+    def get_list_data(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        return list(self.get_serializer(queryset, many=True).data)
+
+
+class AnonymousResponseCacheMixin:
+    response_cache_params = ('page', 'limit', 'tags', 'author', 'cursor')
+    response_cache_versions = ('recipes', 'tags', 'ingredients', 'users')
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_response_cache_key(self, request):
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        versions = self.response_cache_versions
+        if lookup is not None:
+            versions = (f'recipe:{lookup}',) + versions[1:]
+        # Ссылки next/previous строятся из полного адреса запроса, поэтому
+        # в ключ входят схема, хост и строка запроса целиком.
+        key = hashlib.md5(
+            f'{request.build_absolute_uri()}:{self.action}:{lookup}:'
+            f'{get_versions(*versions)}'.encode()
+        ).hexdigest()
+        return f'response:{self.basename}:{key}'
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if (
+            request.user.is_authenticated
+            or renderer.format != 'json'
+            or not set(request.query_params) <= set(
+                self.response_cache_params
+            )
+        ):
+            # Посторонние параметры не кешируются, чтобы случайные
+            # адреса не вытесняли полезные ответы.
+            return handler(request, *args, **kwargs)
+
+        response_cache = caches['responses']
+        key = self.get_response_cache_key(request)
+        content = response_cache.get(key)
+        if content is None:
+            with primary_reads():
+                response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            content = renderer.render(
+                response.data,
+                request.accepted_media_type,
+                self.get_renderer_context(),
+            )
+            response_cache.set(key, content)
+            response_cache_stats['miss'] += 1
+            cache_status = 'MISS'
+        else:
+            response_cache_stats['hit'] += 1
+            cache_status = 'HIT'
+
+        response = HttpResponse(content, content_type=renderer.media_type)
+        response['X-Cache'] = cache_status
+        return response
@@ -1,13 +1,55 @@
-from django_filters import NumberFilter, AllValuesMultipleFilter
+from django import forms
+from django.db.models import Exists, OuterRef
+from django_filters import Filter, NumberFilter
 from django_filters.rest_framework import FilterSet
-from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe
+from api.cache import get_version
+from foodgram.db.routers import primary_reads
+from recipes.models import Recipe, Tag
+
+tag_ids_by_slug = {'version': None, 'ids': {}}
+
+
+def get_tag_ids(slugs):
+    version = get_version('tags')
+    if tag_ids_by_slug['version'] != version:
+        with primary_reads():
+            tag_ids_by_slug['ids'] = dict(
+                Tag.objects.values_list('slug', 'id')
+            )
+        tag_ids_by_slug['version'] = version
+    ids = tag_ids_by_slug['ids']
+    return {ids[slug] for slug in slugs if slug in ids}
+
+
+class SlugListField(forms.Field):
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        return [slug for slug in value or () if slug]
+
+
+class TagSlugsFilter(Filter):
+    field_class = SlugListField
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        tag_ids = get_tag_ids(value)
+        if not tag_ids:
+            return qs.none()
+        return qs.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag_id__in=tag_ids
+                )
+            )
+        )
 
 
 class RecipesFilterBackend(FilterSet):
     author = NumberFilter(field_name='author__id')
-    tags = AllValuesMultipleFilter(field_name='tags__slug')
+    tags = TagSlugsFilter()
     is_favorited = NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = NumberFilter(method='filter_is_in_shopping_cart')
 
@@ -32,7 +74,3 @@ class RecipesFilterBackend(FilterSet):
             )
 
         return queryset
-
-
-class IngredientFilter(SearchFilter):
-    search_param = 'name'
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+
+from api.cache import response_cache_stats
+from foodgram.db.signals import connection_acquired
+
+logger = logging.getLogger(__name__)
+
+# Контекст копируется в потоки sync_to_async, поэтому запросы к БД
+# учитываются и при выполнении представления вне потока middleware.
+# Хранит все активные счётчики: вложенный track_queries (например, в
+# бенчмарке вокруг middleware) не скрывает внешний.
+current_metrics = ContextVar('current_metrics', default=())
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+CONNECT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 1)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.endpoint = 'unresolved'
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.connect_time = 0.0
+        self.duration = 0.0
+        self.started = perf_counter()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.responses = defaultdict(int)
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.over_budget = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = defaultdict(EndpointMetrics)
+        self.connections = defaultdict(lambda: Histogram(CONNECT_BUCKETS))
+
+    def record_connection(self, alias, source, duration):
+        with self.lock:
+            self.connections[(alias, source)].observe(duration)
+
+    def record(self, request, response, stats):
+        with self.lock:
+            endpoint = self.endpoints[stats.endpoint]
+            endpoint.responses[
+                (request.method, response.status_code)
+            ] += 1
+            endpoint.duration.observe(stats.duration)
+            endpoint.queries.observe(stats.queries)
+            endpoint.db_time += stats.db_time
+            endpoint.serializer_time += stats.serializer_time
+            over_budget = stats.queries > get_query_budget(stats.endpoint)
+            if over_budget:
+                endpoint.over_budget += 1
+        if over_budget:
+            logger.warning(
+                '%s %s (%s): %d SQL-запросов при бюджете %d, '
+                'БД %.1f мс (подключение %.1f мс), сериализация %.1f мс, '
+                'всего %.1f мс',
+                request.method,
+                request.path,
+                stats.endpoint,
+                stats.queries,
+                get_query_budget(stats.endpoint),
+                stats.db_time * 1000,
+                stats.connect_time * 1000,
+                stats.serializer_time * 1000,
+                stats.duration * 1000,
+            )
+
+    def render(self):
+        with self.lock:
+            return '\n'.join(self.lines()) + '\n'
+
+    def lines(self):
+        endpoints = sorted(self.endpoints.items())
+        yield '# HELP foodgram_requests_total Обработанные запросы.'
+        yield '# TYPE foodgram_requests_total counter'
+        for name, endpoint in endpoints:
+            for (method, code), count in sorted(endpoint.responses.items()):
+                yield (
+                    f'foodgram_requests_total{{endpoint="{name}",'
+                    f'method="{method}",status="{code}"}} {count}'
+                )
+        yield '# HELP foodgram_request_duration_seconds Время ответа.'
+        yield '# TYPE foodgram_request_duration_seconds histogram'
+        for name, endpoint in endpoints:
+            yield from endpoint.duration.lines(
+                'foodgram_request_duration_seconds', f'endpoint="{name}"'
+            )
+        yield '# HELP foodgram_db_queries SQL-запросы на один запрос.'
+        yield '# TYPE foodgram_db_queries histogram'
+        for name, endpoint in endpoints:
+            yield from endpoint.queries.lines(
+                'foodgram_db_queries', f'endpoint="{name}"'
+            )
+        counters = (
+            ('db_duration_seconds_total', 'Время в БД.', 'db_time'),
+            (
+                'serializer_duration_seconds_total',
+                'Время сериализации.',
+                'serializer_time',
+            ),
+            (
+                'query_budget_exceeded_total',
+                'Запросы сверх бюджета SQL-запросов.',
+                'over_budget',
+            ),
+        )
+        for metric, description, attribute in counters:
+            yield f'# HELP foodgram_{metric} {description}'
+            yield f'# TYPE foodgram_{metric} counter'
+            for name, endpoint in endpoints:
+                yield (
+                    f'foodgram_{metric}{{endpoint="{name}"}} '
+                    f'{getattr(endpoint, attribute)}'
+                )
+        yield (
+            '# HELP foodgram_db_connection_acquire_seconds '
+            'Время получения соединения с БД.'
+        )
+        yield '# TYPE foodgram_db_connection_acquire_seconds histogram'
+        for (alias, source), histogram in sorted(self.connections.items()):
+            yield from histogram.lines(
+                'foodgram_db_connection_acquire_seconds',
+                f'alias="{alias}",source="{source}"',
+            )
+        yield '# HELP foodgram_response_cache_total Кеш анонимных ответов.'
+        yield '# TYPE foodgram_response_cache_total counter'
+        for result in ('hit', 'miss'):
+            yield (
+                f'foodgram_response_cache_total{{result="{result}"}} '
+                f'{response_cache_stats[result]}'
+            )
+
+
+registry = MetricsRegistry()
+
+
+def get_query_budget(endpoint):
+    return settings.QUERY_BUDGETS.get(
+        endpoint, settings.QUERY_BUDGET_DEFAULT
+    )
+
+
+def get_endpoint(view_func, method):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unresolved')
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+def track_serializer(request, serializer):
+    stats = getattr(request, 'metrics', None)
+    if stats is None:
+        return serializer
+    to_representation = serializer.to_representation
+
+    def timed_to_representation(instance):
+        start = perf_counter()
+        try:
+            return to_representation(instance)
+        finally:
+            stats.serializer_time += perf_counter() - start
+
+    serializer.to_representation = timed_to_representation
+    return serializer
+
+
+def record_query(execute, sql, params, many, context):
+    active = current_metrics.get()
+    if not active:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = perf_counter() - start
+        for stats in active:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+
+def install_query_wrapper(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def on_connection_created(connection, **kwargs):
+    install_query_wrapper(connection)
+
+
+@receiver(connection_acquired)
+def on_connection_acquired(alias, duration, source, **kwargs):
+    registry.record_connection(alias, source, duration)
+    for stats in current_metrics.get():
+        stats.connect_time += duration
+
+
+@contextmanager
+def track_queries(stats):
+    for connection in connections.all():
+        install_query_wrapper(connection)
+    token = current_metrics.set(current_metrics.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        current_metrics.reset(token)
+
+
+class QueryMetricsMiddleware(MiddlewareMixin):
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = request.metrics = RequestMetrics()
+        # Запросы потоковых ответов выполняются после выхода из
+        # middleware и в статистику не попадают.
+        with track_queries(stats):
+            response = self.get_response(request)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = request.metrics = RequestMetrics()
+        with track_queries(stats):
+            response = await self.get_response(request)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        stats.duration = perf_counter() - stats.started
+        registry.record(request, response, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics.endpoint = get_endpoint(view_func, request.method)
+
+
+class SerializerMetricsMixin:
+    def get_serializer(self, *args, **kwargs):
+        return track_serializer(
+            self.request, super().get_serializer(*args, **kwargs)
+        )
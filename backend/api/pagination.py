@@ -1,4 +1,13 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from foodgram import constants
 
@@ -7,3 +16,81 @@ class PageLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = constants.PAGE_SIZE
     max_page_size = constants.NAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    # Совпадает с индексом recipe_pub_date_id_idx.
+    cursor_ordering = ('-pub_date', 'id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*ordering)
+        position = self.decode_cursor(request, ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(
+                    self.get_seek_filter(ordering, position)
+                )
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[: page_size + 1])
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_position = [
+                getattr(results[-1], field.lstrip('-')) for field in ordering
+            ]
+        return results
+
+    def get_seek_filter(self, ordering, position):
+        seek_filter = Q()
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(
+                **{f'{field.lstrip("-")}__{lookup}': position[index]}
+            )
+            for previous_field, value in zip(ordering[:index], position):
+                condition &= Q(**{previous_field.lstrip('-'): value})
+            seek_filter |= condition
+        return seek_filter
+
+    def decode_cursor(self, request, ordering):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        # str() сохраняет микросекунды pub_date, в отличие от
+        # DjangoJSONEncoder.
+        return urlsafe_b64encode(
+            json.dumps(position, default=str).encode()
+        ).decode()
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({'next': self.get_next_link(), 'results': data})
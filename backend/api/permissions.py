@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework.permissions import (
     BasePermission,
     IsAuthenticatedOrReadOnly,
@@ -15,3 +16,11 @@ class AllowAnyExceptMe(BasePermission):
         return (
             '/users/me/' not in request.path or request.user.is_authenticated
         )
+
+
+class IsMetricsClient(BasePermission):
+    def has_permission(self, request, view):
+        return (
+            request.user.is_staff
+            or request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+        )
@@ -0,0 +1,82 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+    filename = 'shopping_list'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Ошибки (401, 404 и т.п.) отдаются обычным JSON.
+        if isinstance(data, dict):
+            return json.dumps(data, ensure_ascii=False).encode(self.charset)
+        return ''.join(self.stream(data)).encode(self.charset)
+
+    def stream(self, shopping_list):
+        raise NotImplementedError
+
+    def get_filename(self):
+        return f'{self.filename}.{self.format}'
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, shopping_list):
+        for item in shopping_list:
+            yield (
+                f'{item["name"]} ({item["measurement_unit"]}) '
+                f'— {item["amount"]}\n'
+            )
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, shopping_list):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for item in shopping_list:
+            yield writer.writerow(
+                (item['name'], item['measurement_unit'], item['amount'])
+            )
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, shopping_list):
+        yield '['
+        separator = ''
+        for item in shopping_list:
+            yield separator + json.dumps(
+                {
+                    'name': item['name'],
+                    'measurement_unit': item['measurement_unit'],
+                    'amount': item['amount'],
+                },
+                ensure_ascii=False,
+            )
+            separator = ', '
+        yield ']'
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return json.dumps(data, ensure_ascii=False).encode(self.charset)
+        return data.encode(self.charset)
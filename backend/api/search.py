@@ -0,0 +1,53 @@
+import threading
+from bisect import bisect_left
+
+from api.cache import get_version
+from foodgram.db.routers import primary_reads
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    def __init__(self):
+        self.version = None
+        # Имена и строки заменяются одним присваиванием, чтобы поиск без
+        # блокировки не увидел новые имена со старыми строками.
+        self.entries = ([], [])
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        version = get_version('ingredients')
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            with primary_reads():
+                rows = sorted(
+                    Ingredient.objects.values(
+                        'id', 'name', 'measurement_unit'
+                    ),
+                    key=lambda row: (row['name'].lower(), row['id']),
+                )
+            self.entries = ([row['name'].lower() for row in rows], rows)
+            self.version = version
+
+    def search(self, query, limit=None):
+        self.refresh()
+        names, rows = self.entries
+        query = query.lower()
+
+        start = bisect_left(names, query)
+        end = bisect_left(names, query + '\U0010ffff', start)
+        result = rows[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+
+        for name, row in zip(names, rows):
+            if query in name and not name.startswith(query):
+                result.append(row)
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex()
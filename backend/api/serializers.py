@@ -1,16 +1,35 @@
 import base64
+import binascii
+from collections import OrderedDict
+from tempfile import SpooledTemporaryFile
 
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.cache import caches
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.base import File
 from django.db import transaction
+from django.db.models import Manager, Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer
+from PIL import Image
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
-from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.relations import (
+    MANY_RELATION_KWARGS,
+    ManyRelatedField,
+    PrimaryKeyRelatedField,
+)
 from rest_framework.serializers import ModelSerializer
 from rest_framework.validators import UniqueTogetherValidator
 
+from api.cache import bump_on_commit, get_versions
+from foodgram import constants
+from foodgram.db.routers import primary_reads, read_database
+from recipes.images import (
+    RENDITIONS,
+    delete_renditions,
+    schedule_renditions,
+)
 from recipes.models import (
     Tag,
     Ingredient,
@@ -19,11 +38,45 @@ from recipes.models import (
     Favorite,
     Subscription,
     ShoppingList,
+    ShoppingCartItem,
 )
 
 User = get_user_model()
 
 
+def get_subscribed_author_ids(request):
+    if not hasattr(request, '_subscribed_author_ids'):
+        request._subscribed_author_ids = set(
+            request.user.subscribes.values_list('author_id', flat=True)
+        )
+    return request._subscribed_author_ids
+
+
+def is_subscribed(request, author_id):
+    return bool(
+        request
+        and request.user.is_authenticated
+        and author_id in get_subscribed_author_ids(request)
+    )
+
+
+def get_recipe_prefetches():
+    return (
+        'tags',
+        Prefetch(
+            'ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient'),
+        ),
+    )
+
+
+def get_recipes_limit(request):
+    try:
+        return max(0, int(request.query_params.get('recipes_limit', 20)))
+    except ValueError:
+        return 20
+
+
 class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -39,23 +92,134 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        request = self.context['request']
-        return (
-            request
-            and request.user.is_authenticated
-            and request.user.subscribes.filter(author=obj).exists()
-        )
+        return is_subscribed(self.context.get('request'), obj.id)
 
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'invalid_base64': 'Некорректное изображение в формате base64.',
+        'unsupported_type': 'Неподдерживаемый тип изображения: {mime_type}.',
+        'too_large': 'Размер изображения не должен превышать {max_size} байт.',
+        'too_many_pixels': 'Слишком большое разрешение изображения.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
+            # Изображение уже проверено в decode_base64, а проверка
+            # ImageField прочитала бы весь файл в память ещё раз.
+            return serializers.FileField.to_internal_value(
+                self, self.decode_base64(data)
+            )
+        return super().to_internal_value(data)
 
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+    def decode_base64(self, data):
+        marker = data.find(';base64,')
+        if marker == -1:
+            self.fail('invalid_base64')
+        # data:image/png;name=photo.png;base64,... — параметры
+        # после типа не учитываются.
+        mime_type = data[len('data:'):marker].split(';')[0].strip().lower()
+        if mime_type not in constants.IMAGE_ALLOWED_TYPES:
+            self.fail('unsupported_type', mime_type=mime_type)
+        start = marker + len(';base64,')
+        if (len(data) - start) * 3 // 4 > constants.IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=constants.IMAGE_MAX_SIZE)
+
+        spooled = SpooledTemporaryFile(max_size=constants.IMAGE_SPOOL_SIZE)
+        size = 0
+        pending = ''
+        try:
+            for position in range(
+                start, len(data), constants.BASE64_CHUNK_SIZE
+            ):
+                # Переводы строк и пробелы убираются, а символы сверх
+                # кратного четырём переносятся в следующий кусок.
+                encoded = pending + ''.join(
+                    data[position:position + constants.BASE64_CHUNK_SIZE]
+                    .split()
+                )
+                usable = len(encoded) - len(encoded) % 4
+                pending = encoded[usable:]
+                chunk = base64.b64decode(encoded[:usable], validate=True)
+                size += len(chunk)
+                if size > constants.IMAGE_MAX_SIZE:
+                    self.fail('too_large', max_size=constants.IMAGE_MAX_SIZE)
+                spooled.write(chunk)
+            if pending:
+                raise binascii.Error('Incorrect padding')
+            spooled.seek(0)
+            with Image.open(spooled) as image:
+                width, height = image.size
+                image_type = Image.MIME.get(image.format)
+                image.verify()
+        except (binascii.Error, SyntaxError, OSError):
+            spooled.close()
+            self.fail('invalid_base64')
+        except Image.DecompressionBombError:
+            spooled.close()
+            self.fail('too_many_pixels')
+        except serializers.ValidationError:
+            spooled.close()
+            raise
+        if image_type not in constants.IMAGE_ALLOWED_TYPES:
+            spooled.close()
+            self.fail('unsupported_type', mime_type=image_type)
+        if width * height > constants.IMAGE_MAX_PIXELS:
+            spooled.close()
+            self.fail('too_many_pixels')
+
+        spooled.seek(0)
+        # Расширение по фактическому формату, а не по заявленному типу.
+        image_file = File(spooled, name='temp.' + image_type.split('/')[-1])
+        image_file.size = size
+        return image_file
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        self.child_relation.resolve(data)
+        return [self.child_relation.to_internal_value(item) for item in data]
+
+
+class BulkPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    resolved = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            raise TypeError
+        return self.get_queryset().model._meta.pk.to_python(data)
+
+    def resolve(self, values):
+        pks = set()
+        for value in values:
+            try:
+                pks.add(self.to_pk(value))
+            except (TypeError, ValueError, DjangoValidationError):
+                continue
+        self.resolved = self.get_queryset().in_bulk(pks)
 
-        return super().to_internal_value(data)
+    def to_internal_value(self, data):
+        if self.resolved is None:
+            return super().to_internal_value(data)
+        try:
+            pk = self.to_pk(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.resolved:
+            self.fail('does_not_exist', pk_value=data)
+        return self.resolved[pk]
 
 
 class TagSerializer(ModelSerializer):
@@ -89,8 +253,17 @@ class RecipeIngredientSerializer(ModelSerializer):
         return obj.ingredient.measurement_unit
 
 
+class RecipeReadListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        return self.child.represent_many(recipes)
+
+
 class RecipeReadSerializer(ModelSerializer):
+    user_fields = ('is_favorited', 'is_in_shopping_cart')
+
     image = SerializerMethodField(read_only=True)
+    image_card = SerializerMethodField(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(many=True, read_only=True)
@@ -108,16 +281,122 @@ class RecipeReadSerializer(ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_card',
             'text',
             'cooking_time',
         )
+        list_serializer_class = RecipeReadListSerializer
+
+    def to_representation(self, instance):
+        return self.represent_many([instance])[0]
+
+    def get_fragment_versions(self, recipe):
+        return (
+            f'recipe:{recipe.pk}',
+            f'user:{recipe.author_id}',
+            'tags',
+            'ingredients',
+        )
+
+    def represent_many(self, recipes):
+        names = {
+            name
+            for recipe in recipes
+            for name in self.get_fragment_versions(recipe)
+        }
+        versions = dict(zip(names, get_versions(*names)))
+        keys = {
+            recipe.pk: f'recipe-fragment:{recipe.pk}:'
+            + ':'.join(
+                str(versions[name])
+                for name in self.get_fragment_versions(recipe)
+            )
+            for recipe in recipes
+        }
+        fragment_cache = caches['fragments']
+        fragments = fragment_cache.get_many(keys.values())
+
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in fragments
+        ]
+        if missing:
+            sources = self.get_fragment_sources(missing)
+            built = {
+                keys[pk]: self.build_fragment(recipe)
+                for pk, recipe in sources.items()
+            }
+            fragment_cache.set_many(built, constants.RECIPE_FRAGMENT_TIMEOUT)
+            fragments.update(built)
+            # Рецепт уже удалён в основной БД: отдаётся по данным
+            # реплики без кеширования.
+            gone = [recipe for recipe in missing if recipe.pk not in sources]
+            prefetch_related_objects(gone, *get_recipe_prefetches())
+            for recipe in gone:
+                fragments[keys[recipe.pk]] = self.build_fragment(recipe)
+
+        return [
+            self.add_user_fields(fragments[keys[recipe.pk]], recipe)
+            for recipe in recipes
+        ]
+
+    def get_fragment_sources(self, recipes):
+        if read_database.get() is None:
+            prefetch_related_objects(recipes, *get_recipe_prefetches())
+            return {recipe.pk: recipe for recipe in recipes}
+        # Фрагменты общие для всех клиентов, поэтому строятся по основной
+        # БД, а не по реплике, которая может отставать от версии.
+        with primary_reads():
+            sources = Recipe.objects.select_related('author').in_bulk(
+                [recipe.pk for recipe in recipes]
+            )
+            prefetch_related_objects(
+                list(sources.values()), *get_recipe_prefetches()
+            )
+        return sources
+
+    def build_fragment(self, instance):
+        fragment = {}
+        for field in self._readable_fields:
+            if field.field_name in self.user_fields:
+                continue
+            attribute = field.get_attribute(instance)
+            fragment[field.field_name] = (
+                None
+                if attribute is None
+                else field.to_representation(attribute)
+            )
+        fragment['author'].pop('is_subscribed', None)
+        return fragment
+
+    def add_user_fields(self, fragment, instance):
+        user_fields = {
+            'author': dict(
+                fragment['author'],
+                is_subscribed=is_subscribed(
+                    self.context.get('request'), instance.author_id
+                ),
+            ),
+            'is_favorited': self.get_is_favorited(instance),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(instance),
+        }
+        return OrderedDict(
+            (name, user_fields.get(name, fragment.get(name)))
+            for name in self.Meta.fields
+        )
 
     def get_image(self, obj):
         if obj.image:
             return obj.image.url
         return None
 
+    def get_image_card(self, obj):
+        if obj.image_card:
+            return obj.image_card.url
+        return None
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context['request']
         return (
             request
@@ -126,6 +405,8 @@ class RecipeReadSerializer(ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context['request']
         return (
             request
@@ -134,20 +415,30 @@ class RecipeReadSerializer(ModelSerializer):
         )
 
 
+class WriteRecipeIngredientListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child.fields['id'].resolve(
+                item.get('id') for item in data if isinstance(item, dict)
+            )
+        return super().to_internal_value(data)
+
+
 class WriteRecipeIngredientSerializer(ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(), source='ingredient'
     )
 
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
+        list_serializer_class = WriteRecipeIngredientListSerializer
 
 
 class RecipeWriteSerializer(ModelSerializer):
     image = Base64ImageField(required=True)
     ingredients = WriteRecipeIngredientSerializer(many=True)
-    tags = PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True,
         required=True,
         queryset=Tag.objects.all(),
@@ -167,8 +458,11 @@ class RecipeWriteSerializer(ModelSerializer):
 
     def to_representation(self, instance):
         request = self.context.get('request')
+        # Ответ кеширует фрагмент под уже новой версией, поэтому рецепт
+        # перечитывается: миниатюры и связи записаны мимо объекта в памяти.
+        recipe = Recipe.objects.select_related('author').get(pk=instance.pk)
         return RecipeReadSerializer(
-            instance, context={'request': request}
+            recipe, context={'request': request}
         ).data
 
     def validate(self, data):
@@ -177,26 +471,23 @@ class RecipeWriteSerializer(ModelSerializer):
 
         if not tags:
             raise ValidationError({'tags': 'Выберите хотя-бы один тег!'})
-        tags_list = []
-        for tag in tags:
-            if tag.id not in tags_list:
-                tags_list.append(tag.id)
-            else:
-                raise ValidationError({'tags': 'Теги не могут повторятся!'})
+        if len({tag.id for tag in tags}) != len(tags):
+            raise ValidationError({'tags': 'Теги не могут повторятся!'})
 
         if not ingredients:
             raise ValidationError(
                 {'ingredients': 'Рецепт не может быть без ингредиентов!'}
             )
-        ingredient_list = []
+        ingredient_ids = set()
         for ingredient in ingredients:
-            ingredient_name = ingredient['ingredient'].name
+            ingredient_id = ingredient['ingredient'].id
 
-            if ingredient_name in ingredient_list:
+            if ingredient_id in ingredient_ids:
+                ingredient_name = ingredient['ingredient'].name
                 error = f'Ингридиент {ingredient_name} повторяется!'
                 raise ValidationError({'ingredients': error})
 
-            ingredient_list.append(ingredient_name)
+            ingredient_ids.add(ingredient_id)
         return data
 
     @transaction.atomic
@@ -210,6 +501,7 @@ class RecipeWriteSerializer(ModelSerializer):
         recipe.tags.set(tags)
 
         self.process_recipe_ingredients(recipe, ingredients)
+        schedule_renditions(recipe)
 
         return recipe
 
@@ -218,16 +510,90 @@ class RecipeWriteSerializer(ModelSerializer):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
 
-        instance.tags.clear()
         instance.tags.set(tags)
 
-        instance.ingredients.all().delete()
+        self.update_recipe_ingredients(instance, ingredients)
+
+        image_changed = 'image' in validated_data
+        if image_changed:
+            stale_renditions = [
+                getattr(instance, field_name).name
+                for field_name in RENDITIONS
+            ]
+            for field_name in RENDITIONS:
+                validated_data[field_name] = ''
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Миниатюры записывает обработчик изображений, поэтому без новой
+        # картинки они в сохранение не попадают.
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        # Теги и ингредиенты пишутся без сигналов модели (set, bulk_*),
+        # а сохранение без изменённых полей их не отправляет.
+        bump_on_commit(f'recipe:{instance.pk}', 'recipes')
+        if image_changed:
+            schedule_renditions(instance)
+            transaction.on_commit(lambda: delete_renditions(stale_renditions))
 
-        self.process_recipe_ingredients(instance, ingredients)
+        return instance
 
-        instance = super().update(instance, validated_data)
+    def update_recipe_ingredients(self, recipe_instance, ingredients):
+        existing = {}
+        stale = []
+        old_amounts = {}
+        for recipe_ingredient in recipe_instance.ingredients.all():
+            ingredient_id = recipe_ingredient.ingredient_id
+            old_amounts[ingredient_id] = (
+                old_amounts.get(ingredient_id, 0) + recipe_ingredient.amount
+            )
+            if ingredient_id in existing:
+                stale.append(recipe_ingredient.pk)
+            else:
+                existing[ingredient_id] = recipe_ingredient
 
-        return instance
+        to_create = []
+        to_update = []
+        new_amounts = {}
+        for ingredient in ingredients:
+            ingredient_id = ingredient['ingredient'].id
+            new_amounts[ingredient_id] = ingredient['amount']
+            recipe_ingredient = existing.pop(ingredient_id, None)
+            if recipe_ingredient is None:
+                to_create.append(
+                    RecipeIngredient(
+                        recipe=recipe_instance,
+                        ingredient=ingredient['ingredient'],
+                        amount=ingredient['amount'],
+                    )
+                )
+            elif recipe_ingredient.amount != ingredient['amount']:
+                recipe_ingredient.amount = ingredient['amount']
+                to_update.append(recipe_ingredient)
+        stale.extend(
+            recipe_ingredient.pk for recipe_ingredient in existing.values()
+        )
+
+        if stale:
+            RecipeIngredient.objects.filter(pk__in=stale).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+
+        # bulk_create и bulk_update не отправляют сигналы, поэтому
+        # корзины пересчитываются здесь.
+        changed = [
+            ingredient_id
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+            if old_amounts.get(ingredient_id) != new_amounts.get(ingredient_id)
+        ]
+        if changed:
+            ShoppingCartItem.objects.rebuild(
+                recipe_instance.shopping_list.values_list(
+                    'user_id', flat=True
+                ),
+                changed,
+            )
 
     @transaction.atomic
     def process_recipe_ingredients(self, recipe_instance, ingredients):
@@ -283,6 +649,7 @@ class ShoppingListSerializer(ModelSerializer):
 
 class ShortRecipeSerializer(ModelSerializer):
     image = Base64ImageField(required=False, allow_null=True)
+    image_thumbnail = serializers.ImageField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -290,13 +657,13 @@ class ShortRecipeSerializer(ModelSerializer):
             'id',
             'name',
             'image',
+            'image_thumbnail',
             'cooking_time',
         )
 
 
 class SubscribedUserSerializer(CustomUserSerializer):
     recipes = SerializerMethodField()
-    recipes_count = SerializerMethodField()
 
     class Meta(CustomUserSerializer.Meta):
         fields = CustomUserSerializer.Meta.fields + (
@@ -305,17 +672,8 @@ class SubscribedUserSerializer(CustomUserSerializer):
         )
         model = User
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def get_recipes(self, obj):
-        try:
-            recipes_limit = int(
-                self.context['request'].query_params.get('recipes_limit', 20)
-            )
-        except ValueError:
-            recipes_limit = 20
-
+        recipes_limit = get_recipes_limit(self.context['request'])
         recipes = obj.recipes.all()[:recipes_limit]
         serializer = ShortRecipeSerializer(recipes, many=True)
         return serializer.data
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import forget_tokens
+from api.cache import bump_on_commit
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_on_commit('tags')
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    bump_on_commit('ingredients')
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_recipe(instance, **kwargs):
+    bump_on_commit(f'recipe:{instance.pk}', 'recipes')
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def invalidate_recipe_ingredients(instance, **kwargs):
+    bump_on_commit(f'recipe:{instance.recipe_id}', 'recipes')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_on_commit(f'recipe:{instance.pk}', 'recipes')
+    elif pk_set:
+        bump_on_commit(*(f'recipe:{pk}' for pk in pk_set), 'recipes')
+    else:
+        bump_on_commit('tags')
+
+
+@receiver(post_save, sender=User)
+def invalidate_users(instance, update_fields, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    # Ответы для анонимов содержат только авторов рецептов, поэтому
+    # регистрация и правки остальных пользователей их не сбрасывают.
+    if Recipe.objects.filter(author=instance).exists():
+        bump_on_commit(f'user:{instance.pk}', 'users')
+    else:
+        bump_on_commit(f'user:{instance.pk}')
+    # Деактивация, смена пароля и профиля сбрасывают кеш токена.
+    keys = list(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+    if keys:
+        transaction.on_commit(lambda: forget_tokens(*keys))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(instance, **kwargs):
+    transaction.on_commit(lambda: forget_tokens(instance.key))
@@ -1,11 +1,14 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from api.async_views import async_read_patterns, async_read_view
 from api.views import (
     TagViewSet,
     IngredientViewSet,
     RecipeViewSet,
     AddOrDeleteSubscription,
+    Metrics,
     Subscriptions,
 )
 
@@ -16,9 +19,26 @@ router.register(r'tags', TagViewSet, basename='tags')
 router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 
+router_urls = router.urls
+subscriptions_view = Subscriptions.as_view()
+if settings.ASYNC_READ_VIEWS:
+    router_urls = async_read_patterns(
+        router_urls,
+        {
+            'tags-list',
+            'tags-detail',
+            'ingredients-list',
+            'ingredients-detail',
+            'recipes-list',
+            'recipes-detail',
+        },
+    )
+    subscriptions_view = async_read_view(subscriptions_view)
+
 urlpatterns = [
-    path('', include(router.urls)),
-    path('users/subscriptions/', Subscriptions.as_view()),
+    path('', include(router_urls)),
+    path('metrics/', Metrics.as_view()),
+    path('users/subscriptions/', subscriptions_view),
     path('users/<int:pk>/subscribe/', AddOrDeleteSubscription.as_view()),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
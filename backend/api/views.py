@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum, F
-from django.http import HttpResponse
-from django.template.loader import render_to_string
+from django.db import transaction
+from django.db.models import F, Prefetch, Exists, OuterRef
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.decorators import action
@@ -11,9 +12,18 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
 
-from api.filters import RecipesFilterBackend, IngredientFilter
+from api.cache import AnonymousResponseCacheMixin, CachedListMixin
+from api.filters import RecipesFilterBackend
+from api.metrics import SerializerMetricsMixin, registry, track_serializer
 from api.pagination import PageLimitPagination
-from api.permissions import IsAuthorOrReadOnlyPermission
+from api.renderers import (
+    PrometheusRenderer,
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+)
+from api.permissions import IsAuthorOrReadOnlyPermission, IsMetricsClient
+from api.search import ingredient_index
 from api.serializers import (
     TagSerializer,
     IngredientSerializer,
@@ -23,42 +33,84 @@ from api.serializers import (
     SubscribedUserSerializer,
     SubscribeSerializer,
     ShoppingListSerializer,
+    get_recipes_limit,
 )
+from foodgram import constants
 from recipes.models import (
     Tag,
     Ingredient,
     Recipe,
     Favorite,
     Subscription,
-    RecipeIngredient,
     ShoppingList,
+    ShoppingCartItem,
 )
 
 User = get_user_model()
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(
+    SerializerMetricsMixin, CachedListMixin, ReadOnlyModelViewSet
+):
     permission_classes = (IsAuthorOrReadOnlyPermission,)
     pagination_class = None
+    cache_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(
+    SerializerMetricsMixin, CachedListMixin, ReadOnlyModelViewSet
+):
     pagination_class = None
+    cache_name = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
+
+    def get_list_data(self):
+        name = self.request.query_params.get('name')
+        if not name:
+            return super().get_list_data()
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (KeyError, ValueError):
+            limit = None
+        if limit is not None and limit < 1:
+            limit = None
+        return ingredient_index.search(name, limit)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(
+    SerializerMetricsMixin, AnonymousResponseCacheMixin, ModelViewSet
+):
     permission_classes = (IsAuthorOrReadOnlyPermission,)
     pagination_class = PageLimitPagination
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipesFilterBackend
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Теги и ингредиенты подгружает RecipeReadSerializer
+            # только для рецептов, которых нет в кеше фрагментов.
+            queryset = queryset.select_related('author')
+            user = self.request.user
+            if user.is_authenticated:
+                queryset = queryset.annotate(
+                    is_favorited=Exists(
+                        Favorite.objects.filter(
+                            user=user, recipe=OuterRef('pk')
+                        )
+                    ),
+                    is_in_shopping_cart=Exists(
+                        ShoppingList.objects.filter(
+                            user=user, recipe=OuterRef('pk')
+                        )
+                    ),
+                )
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RecipeWriteSerializer
@@ -69,17 +121,20 @@ class RecipeViewSet(ModelViewSet):
         methods=['post'],
         permission_classes=[IsAuthenticated],
     )
+    @transaction.atomic
     def favorite(self, request, pk=None):
         user = request.user
         data = {'user': user.pk, 'recipe': pk}
-        serializer = FavoriteSerializer(
-            context={'request': request}, data=data
+        serializer = track_serializer(
+            request,
+            FavoriteSerializer(context={'request': request}, data=data),
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @favorite.mapping.delete
+    @transaction.atomic
     def delete_favorite(self, request, pk=None):
         user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -90,28 +145,46 @@ class RecipeViewSet(ModelViewSet):
         favorite.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(detail=False, permission_classes=[IsAuthenticated])
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+        ],
+    )
     def download_shopping_cart(self, request):
         user = request.user
 
-        aggregated_shopping_list = (
-            RecipeIngredient.objects.filter(recipe__shopping_list__user=user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(
-                amount=Sum('amount'),
+        shopping_list = (
+            ShoppingCartItem.objects.filter(user=user)
+            .values(
                 name=F('ingredient__name'),
                 measurement_unit=F('ingredient__measurement_unit'),
+                amount=F('total_amount'),
             )
+            .order_by('ingredient__name')
         )
 
-        context = {'shopping_list': aggregated_shopping_list}
-
-        shopping_cart_text = render_to_string('shopping_list.txt', context)
+        # Поток читается уже после выхода из middleware маршрутизации,
+        # поэтому база выбирается сейчас.
+        items = shopping_list.using(shopping_list.db).iterator(
+            chunk_size=constants.SHOPPING_LIST_CHUNK_SIZE
+        )
+        if settings.ASYNC_READ_VIEWS:
+            # Под ASGI Django 3.2 читает потоковый ответ в цикле событий,
+            # где обращаться к БД нельзя.
+            items = list(items)
 
-        response = HttpResponse(shopping_cart_text, content_type='text/plain')
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(items),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
         response[
             'Content-Disposition'
-        ] = 'attachment; filename="shopping_list.txt"'
+        ] = f'attachment; filename="{renderer.get_filename()}"'
 
         return response
 
@@ -120,17 +193,20 @@ class RecipeViewSet(ModelViewSet):
         methods=['post'],
         permission_classes=[IsAuthenticated],
     )
+    @transaction.atomic
     def shopping_cart(self, request, pk=None):
         user = request.user
         data = {'user': user.pk, 'recipe': pk}
-        serializer = ShoppingListSerializer(
-            context={'request': request}, data=data
+        serializer = track_serializer(
+            request,
+            ShoppingListSerializer(context={'request': request}, data=data),
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
+    @transaction.atomic
     def delete_shopping_cart(self, request, pk=None):
         user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -144,17 +220,31 @@ class RecipeViewSet(ModelViewSet):
 
 class Subscriptions(APIView):
     permission_classes = (IsAuthorOrReadOnlyPermission,)
+    cursor_ordering = ('id',)
 
     def get(self, request):
-        subscribes = User.objects.filter(
-            subscribers__subscriber=self.request.user
+        recent_recipes = Recipe.objects.filter(
+            author=OuterRef('author')
+        ).values('pk')[: get_recipes_limit(request)]
+        subscribes = (
+            User.objects.filter(subscribers__subscriber=self.request.user)
+            .prefetch_related(
+                Prefetch(
+                    'recipes',
+                    queryset=Recipe.objects.filter(pk__in=recent_recipes),
+                )
+            )
+            .order_by('id')
         )
         paginator = PageLimitPagination()
-        page = paginator.paginate_queryset(subscribes, request)
-        serializer = SubscribedUserSerializer(
-            page,
-            many=True,
-            context={'request': request},
+        page = paginator.paginate_queryset(subscribes, request, view=self)
+        serializer = track_serializer(
+            request,
+            SubscribedUserSerializer(
+                page,
+                many=True,
+                context={'request': request},
+            ),
         )
         return paginator.get_paginated_response(serializer.data)
 
@@ -162,18 +252,21 @@ class Subscriptions(APIView):
 class AddOrDeleteSubscription(APIView):
     permission_classes = (IsAuthorOrReadOnlyPermission,)
 
+    @transaction.atomic
     def post(self, request, pk):
         author = get_object_or_404(User, pk=pk)
         user = request.user
         data = {'subscriber': user.pk, 'author': author.pk}
 
-        serializer = SubscribeSerializer(
-            context={'request': request}, data=data
+        serializer = track_serializer(
+            request,
+            SubscribeSerializer(context={'request': request}, data=data),
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete(self, request, pk):
         author = get_object_or_404(User, pk=pk)
         user = request.user
@@ -186,3 +279,11 @@ class AddOrDeleteSubscription(APIView):
             return Response(status=status.HTTP_400_BAD_REQUEST, data=data)
         subscription.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class Metrics(APIView):
+    permission_classes = (IsMetricsClient,)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request):
+        return Response(registry.render())
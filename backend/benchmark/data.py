@@ -0,0 +1,192 @@
+import io
+import random
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image
+
+from api.cache import bump_version
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCartItem,
+    ShoppingList,
+    Subscription,
+    Tag,
+)
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'bench_'
+PASSWORD = 'benchmark-password'
+INGREDIENTS_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+IMAGE_NAME = 'recipe_images/benchmark.png'
+BATCH_SIZE = 1000
+
+
+def get_image_name():
+    if not default_storage.exists(IMAGE_NAME):
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), (200, 120, 40)).save(buffer, 'PNG')
+        default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+    return IMAGE_NAME
+
+
+def ensure_reference_data(stdout=None):
+    if not Ingredient.objects.exists() or not Tag.objects.exists():
+        call_command(
+            'load_data', path=INGREDIENTS_PATH, format='csv', stdout=stdout
+        )
+    return (
+        list(Tag.objects.values_list('id', flat=True)),
+        list(Ingredient.objects.values_list('id', flat=True)),
+    )
+
+
+def sample_pairs(rng, left_ids, right_ids, per_left, exclude_same=False):
+    for left_id in left_ids:
+        count = min(per_left, len(right_ids))
+        for right_id in rng.sample(right_ids, count):
+            if exclude_same and left_id == right_id:
+                continue
+            yield left_id, right_id
+
+
+def clear(users):
+    # Данные прошлого запуска удаляются в обход сигналов: каскад шёл бы
+    # построчно с пересчётом счётчиков и корзин, а они всё равно
+    # пересчитываются целиком после генерации.
+    recipes = Recipe.objects.filter(author__in=users)
+    for queryset in (
+        ShoppingCartItem.objects.filter(user__in=users),
+        ShoppingList.objects.filter(Q(user__in=users) | Q(recipe__in=recipes)),
+        Favorite.objects.filter(Q(user__in=users) | Q(recipe__in=recipes)),
+        Subscription.objects.filter(
+            Q(subscriber__in=users) | Q(author__in=users)
+        ),
+        RecipeIngredient.objects.filter(recipe__in=recipes),
+        Recipe.tags.through.objects.filter(recipe__in=recipes),
+        recipes,
+    ):
+        queryset._raw_delete(queryset.db)
+    users.delete()
+
+
+@transaction.atomic
+def generate(
+    users=2000,
+    recipes=10000,
+    favorites=20,
+    subscriptions=10,
+    cart=5,
+    seed=0,
+    stdout=None,
+):
+    rng = random.Random(seed)
+    tag_ids, ingredient_ids = ensure_reference_data(stdout)
+
+    clear(User.objects.filter(username__startswith=USERNAME_PREFIX))
+
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        (
+            User(
+                email=f'{USERNAME_PREFIX}{index}@example.com',
+                username=f'{USERNAME_PREFIX}{index}',
+                first_name=f'Имя{index}',
+                last_name=f'Фамилия{index}',
+                password=password,
+            )
+            for index in range(users)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(
+        User.objects.filter(username__startswith=USERNAME_PREFIX)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+
+    image = get_image_name()
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author_id=rng.choice(user_ids),
+                name=f'Рецепт {index}',
+                image=image,
+                text=f'Описание рецепта {index}.',
+                cooking_time=rng.randint(5, 180),
+            )
+            for index in range(recipes)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    recipe_ids = list(
+        Recipe.objects.filter(author_id__in=user_ids)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+
+    RecipeIngredient.objects.bulk_create(
+        (
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(
+                ingredient_ids, rng.randint(3, 10)
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    Recipe.tags.through.objects.bulk_create(
+        (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, rng.randint(1, len(tag_ids)))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    Favorite.objects.bulk_create(
+        (
+            Favorite(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in sample_pairs(
+                rng, user_ids, recipe_ids, favorites
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    Subscription.objects.bulk_create(
+        (
+            Subscription(subscriber_id=subscriber_id, author_id=author_id)
+            for subscriber_id, author_id in sample_pairs(
+                rng, user_ids, user_ids, subscriptions, exclude_same=True
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    ShoppingList.objects.bulk_create(
+        (
+            ShoppingList(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in sample_pairs(
+                rng, user_ids, recipe_ids, cart
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    ShoppingCartItem.objects.rebuild()
+    call_command('recount_counters', stdout=stdout)
+    for name in ('users', 'recipes', 'tags', 'ingredients'):
+        transaction.on_commit(lambda name=name: bump_version(name))
+    return len(user_ids), len(recipe_ids)
@@ -0,0 +1,161 @@
+import base64
+import io
+import math
+import random
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.metrics import RequestMetrics, track_queries
+from benchmark.data import USERNAME_PREFIX
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (40, 120, 200)).save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+class BenchmarkContext:
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        self.user = (
+            users.filter(shopping_list__isnull=False)
+            .order_by('id')
+            .first()
+        )
+        if self.user is None:
+            raise ValueError('Нет тестовых данных, запустите benchmark_data.')
+        self.recipe_ids = list(
+            Recipe.objects.filter(author__in=users).values_list(
+                'id', flat=True
+            )
+        )
+        self.pages = max(1, min(20, len(self.recipe_ids) // 6))
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True))
+        self.tag_slugs = list(Tag.objects.values_list('slug', flat=True))
+        self.ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)[:1000]
+        )
+        self.image = make_image()
+
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.anonymous_client = APIClient()
+
+
+def feed(context):
+    page = context.rng.randint(1, context.pages)
+    return context.client, f'/api/recipes/?page={page}&limit=6', None
+
+
+def feed_anonymous(context):
+    page = context.rng.randint(1, context.pages)
+    return (
+        context.anonymous_client,
+        f'/api/recipes/?page={page}&limit=6',
+        None,
+    )
+
+
+def tag_filter(context):
+    slugs = context.rng.sample(
+        context.tag_slugs, min(2, len(context.tag_slugs))
+    )
+    query = '&'.join(f'tags={slug}' for slug in slugs)
+    return context.client, f'/api/recipes/?{query}&limit=6', None
+
+
+def recipe_detail(context):
+    recipe_id = context.rng.choice(context.recipe_ids)
+    return context.client, f'/api/recipes/{recipe_id}/', None
+
+
+def subscriptions(context):
+    return (
+        context.client,
+        '/api/users/subscriptions/?limit=6&recipes_limit=3',
+        None,
+    )
+
+
+def cart_download(context):
+    return context.client, '/api/recipes/download_shopping_cart/', None
+
+
+def recipe_create(context):
+    rng = context.rng
+    data = {
+        'tags': rng.sample(context.tag_ids, 1),
+        'ingredients': [
+            {'id': ingredient_id, 'amount': rng.randint(1, 500)}
+            for ingredient_id in rng.sample(context.ingredient_ids, 8)
+        ],
+        'name': f'Рецепт бенчмарка {rng.randint(0, 10 ** 9)}',
+        'image': context.image,
+        'text': 'Описание.',
+        'cooking_time': rng.randint(5, 180),
+    }
+    return context.client, '/api/recipes/', data
+
+
+SCENARIOS = {
+    'feed': feed,
+    'feed_anonymous': feed_anonymous,
+    'tag_filter': tag_filter,
+    'recipe_detail': recipe_detail,
+    'subscriptions': subscriptions,
+    'cart_download': cart_download,
+    'recipe_create': recipe_create,
+}
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def perform(context, scenario):
+    client, path, data = SCENARIOS[scenario](context)
+    stats = RequestMetrics()
+    with track_queries(stats):
+        start = perf_counter()
+        if data is None:
+            response = client.get(path)
+        else:
+            response = client.post(path, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = perf_counter() - start
+    if response.status_code >= 400:
+        raise ValueError(f'{scenario}: {path} вернул {response.status_code}')
+    return elapsed, stats.queries
+
+
+def run(context, scenario, iterations, warmup):
+    for _ in range(warmup):
+        perform(context, scenario)
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        elapsed, count = perform(context, scenario)
+        timings.append(elapsed)
+        queries.append(count)
+    return {
+        'scenario': scenario,
+        'iterations': iterations,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'throughput_rps': iterations / sum(timings),
+        'queries_avg': sum(queries) / iterations,
+        'queries_max': max(queries),
+    }
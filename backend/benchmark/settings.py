@@ -0,0 +1,27 @@
+import os
+
+from foodgram.settings import *  # noqa: F401,F403
+from foodgram.settings import BASE_DIR
+
+# Без POSTGRES_DB бенчмарк работает на локальной SQLite.
+if not os.getenv('POSTGRES_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'benchmark.sqlite3',
+        }
+    }
+    DATABASE_REPLICAS = []
+
+    # Файл реплики, например копия benchmark.sqlite3: чтения уходят
+    # в него, записи — в основной файл.
+    if os.getenv('BENCHMARK_SQLITE_REPLICA'):
+        DATABASES['replica_1'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / os.getenv('BENCHMARK_SQLITE_REPLICA'),
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS = ['replica_1']
+
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+MEDIA_ROOT = BASE_DIR / 'benchmark_media'
@@ -6,3 +6,19 @@ PAGE_SIZE = 20
 NAX_PAGE_SIZE = 100
 RECIPE_MIN_NUM = 1
 RECIPE_EXTRA = 0
+SHOPPING_LIST_CHUNK_SIZE = 500
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+REFERENCE_LOCAL_CACHE_SIZE = 256
+REFERENCE_LOCAL_CACHE_TIMEOUT = 60
+IMAGE_THUMBNAIL_SIZE = (320, 320)
+IMAGE_CARD_SIZE = (960, 960)
+IMAGE_RENDITION_QUALITY = 80
+IMAGE_ALLOWED_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/gif')
+IMAGE_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_SPOOL_SIZE = 1024 * 1024
+BASE64_CHUNK_SIZE = 64 * 1024
+RECIPE_FRAGMENT_TIMEOUT = 60 * 60
+# С кешем, не общим для всех серверов, после выхода или деактивации
+# другие серверы принимают старый токен не дольше этого времени.
+TOKEN_CACHE_TIMEOUT = 60
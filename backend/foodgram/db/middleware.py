@@ -0,0 +1,65 @@
+import asyncio
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+
+from foodgram.db.routers import read_database
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'primary_pin'
+PIN_SALT = 'foodgram.db.middleware'
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = read_database.set(self.get_read_database(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = read_database.set(self.get_read_database(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+        return self.pin(request, response)
+
+    def get_read_database(self, request):
+        # Реплика выбирается один раз, чтобы все запросы ответа читали
+        # одно и то же состояние.
+        if request.method not in SAFE_METHODS or request.get_signed_cookie(
+            PIN_COOKIE,
+            default=None,
+            salt=PIN_SALT,
+            max_age=settings.REPLICA_PIN_SECONDS,
+        ):
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def pin(self, request, response):
+        # После записи клиент какое-то время читает из основной БД,
+        # чтобы видеть свои изменения до окончания репликации. Метка
+        # хранится у клиента, поэтому работает с любым числом воркеров
+        # и не путает клиентов за одним адресом.
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_signed_cookie(
+                PIN_COOKIE,
+                '1',
+                salt=PIN_SALT,
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,32 @@
+class CounterFieldsMixin:
+    # Счётчики меняются только выражениями F(), поэтому полное сохранение
+    # строки не должно перезаписывать их значениями из памяти.
+    counter_fields = ()
+
+    def save(
+        self,
+        force_insert=False,
+        force_update=False,
+        using=None,
+        update_fields=None,
+    ):
+        if (
+            update_fields is None
+            and not force_insert
+            and not self._state.adding
+        ):
+            # Как и Django, незагруженные (отложенные) поля не сохраняются.
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(
+            force_insert=force_insert,
+            force_update=force_update,
+            using=using,
+            update_fields=update_fields,
+        )
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+
+
+class ConnectionPool:
+    def __init__(self, size, max_lifetime, timeout):
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.idle = deque()
+        self.created_at = {}
+        self.opened = 0
+        self.condition = threading.Condition()
+
+    def is_expired(self, connection):
+        return (
+            time.monotonic() - self.created_at[connection] >= self.max_lifetime
+        )
+
+    def acquire(self, connect, check=None):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = self.take(deadline)
+            if connection is None:
+                return self.open(connect), False
+            if check is None or check(connection):
+                return connection, True
+            self.discard(connection)
+
+    def take(self, deadline):
+        expired = []
+        try:
+            with self.condition:
+                while True:
+                    while self.idle:
+                        # Последнее возвращённое соединение самое «тёплое».
+                        connection = self.idle.pop()
+                        if not self.is_expired(connection):
+                            return connection
+                        self.forget(connection)
+                        expired.append(connection)
+                    if self.opened < self.size:
+                        self.opened += 1
+                        return None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise OperationalError(
+                            'Нет свободных соединений в пуле БД.'
+                        )
+                    self.condition.wait(remaining)
+        finally:
+            for connection in expired:
+                close_quietly(connection)
+
+    def open(self, connect):
+        try:
+            connection = connect()
+        except Exception:
+            with self.condition:
+                self.opened -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created_at[connection] = time.monotonic()
+        return connection
+
+    def release(self, connection, discard=False):
+        if discard or connection.closed or self.is_expired(connection):
+            self.discard(connection)
+            return
+        with self.condition:
+            self.idle.append(connection)
+            self.condition.notify()
+
+    def discard(self, connection):
+        close_quietly(connection)
+        with self.condition:
+            self.forget(connection)
+
+    def forget(self, connection):
+        self.created_at.pop(connection, None)
+        self.opened -= 1
+        self.condition.notify()
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    with pools_lock:
+        if alias not in pools:
+            pools[alias] = ConnectionPool(**options)
+        return pools[alias]
@@ -0,0 +1,96 @@
+from time import perf_counter
+
+from django.db.backends.postgresql.base import (
+    Database,
+    DatabaseWrapper as PostgreSQLDatabaseWrapper,
+)
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from foodgram.db.pool import get_pool
+from foodgram.db.signals import connection_acquired
+
+
+def check_connection(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(PostgreSQLDatabaseWrapper):
+    health_check_done = False
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL')
+        return get_pool(self.alias, options) if options else None
+
+    @property
+    def health_checks_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def connect(self):
+        start = perf_counter()
+        self.connection_source = 'new'
+        super().connect()
+        self.health_check_done = True
+        connection_acquired.send(
+            sender=self.__class__,
+            alias=self.alias,
+            duration=perf_counter() - start,
+            source=self.connection_source,
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection, reused = pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            ),
+            check_connection if self.health_checks_enabled else None,
+        )
+        if reused:
+            self.connection_source = 'pool'
+            self.isolation_level = self.settings_dict['OPTIONS'].get(
+                'isolation_level', connection.isolation_level
+            )
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        connection = self.connection
+        discard = self.errors_occurred
+        if not discard:
+            try:
+                if (
+                    connection.get_transaction_status()
+                    != TRANSACTION_STATUS_IDLE
+                ):
+                    connection.rollback()
+            except Database.Error:
+                discard = True
+        pool.release(connection, discard)
+
+    def ensure_connection(self):
+        # Постоянное соединение проверяется один раз за запрос, перед
+        # первым обращением к БД.
+        if (
+            self.connection is not None
+            and self.health_checks_enabled
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# По умолчанию всё идёт в основную БД; реплику на весь запрос выбирает
+# ReplicaRoutingMiddleware для безопасных запросов без недавних записей.
+read_database = ContextVar('read_database', default=None)
+
+# Токены читаются сразу после входа, когда реплика может отставать.
+PRIMARY_APPS = {'authtoken'}
+
+
+@contextmanager
+def primary_reads():
+    # Общие кеши заполняются только из основной БД: отстающая реплика
+    # записала бы старые данные под уже новой версией. Промахи кеша
+    # поэтому нагружают основную БД.
+    token = read_database.set(None)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        database = read_database.get()
+        if database is None or model._meta.app_label in PRIMARY_APPS:
+            return 'default'
+        return database
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == 'default'
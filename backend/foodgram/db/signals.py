@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Отправляется после открытия соединения или получения его из пула:
+# alias, duration (секунды), source ('new' или 'pool').
+connection_acquired = Signal()
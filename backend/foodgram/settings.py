@@ -32,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.QueryMetricsMiddleware',
+    'foodgram.db.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,17 +65,107 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# Под ASGI чтение рецептов, тегов, ингредиентов и подписок
+# обслуживают асинхронные представления (см. api.async_views).
+ASYNC_READ_VIEWS = os.getenv('DJANGO_ASGI', 'False') == 'True'
+
+# Встроенный пул соединений (foodgram.db.pool). С пулом соединение
+# возвращается в пул в конце запроса, поэтому CONN_MAX_AGE = 0.
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram.db.postgresql',
         'NAME': os.getenv('POSTGRES_DB'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('POSTGRES_HOST'),
         'PORT': os.getenv('POSTGRES_PORT'),
+        'CONN_MAX_AGE': (
+            0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 60))
+        ),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+        ),
+        'POOL': {
+            'size': int(os.getenv('DB_POOL_SIZE', 10)),
+            'max_lifetime': int(os.getenv('DB_POOL_MAX_LIFETIME', 600)),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        }
+        if DB_POOL
+        else None,
     }
 }
 
+# Реплики только для чтения: DB_REPLICA_HOSTS="host[:port] ...",
+# остальные параметры берутся у основной БД.
+DATABASE_REPLICAS = []
+for index, address in enumerate(
+    os.getenv('DB_REPLICA_HOSTS', '').split(), start=1
+):
+    host, _, port = address.partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['foodgram.db.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает из основной БД.
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+
+# Файловый кеш общий для всех процессов хоста (воркеры gunicorn,
+# load_data), поэтому новые версии справочников видны сразу всем.
+# Нескольким хостам нужен общий бэкенд, например Memcached.
+CACHE_BACKEND = os.getenv(
+    'DJANGO_CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+CACHE_DIR = BASE_DIR / 'cache'
+# Адрес общего сервера кеша; без него у каждого кеша свой каталог.
+CACHE_LOCATION = os.getenv('DJANGO_CACHE_LOCATION')
+
+# Фрагменты рецептов и ответы для анонимов не должны вытеснять версии
+# и токены, поэтому у них отдельные хранилища со своими лимитами.
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION or str(CACHE_DIR / 'default'),
+    },
+    'fragments': {
+        'BACKEND': os.getenv('FRAGMENT_CACHE_BACKEND', CACHE_BACKEND),
+        'LOCATION': os.getenv(
+            'FRAGMENT_CACHE_LOCATION',
+            CACHE_LOCATION or str(CACHE_DIR / 'fragments'),
+        ),
+        'KEY_PREFIX': 'fragments',
+    },
+    'responses': {
+        'BACKEND': os.getenv('RESPONSE_CACHE_BACKEND', CACHE_BACKEND),
+        'LOCATION': os.getenv(
+            'RESPONSE_CACHE_LOCATION',
+            CACHE_LOCATION or str(CACHE_DIR / 'responses'),
+        ),
+        'KEY_PREFIX': 'responses',
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300)),
+    },
+}
+# MAX_ENTRIES учитывают только файловый и локальный бэкенды, лимит
+# действует на LOCATION целиком.
+CACHE_MAX_ENTRIES = {
+    'default': int(os.getenv('DJANGO_CACHE_MAX_ENTRIES', 10000)),
+    'fragments': int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 50000)),
+    'responses': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 5000)),
+}
+for alias, max_entries in CACHE_MAX_ENTRIES.items():
+    if CACHES[alias]['BACKEND'].endswith(
+        ('.FileBasedCache', '.LocMemCache')
+    ):
+        CACHES[alias]['OPTIONS'] = {'MAX_ENTRIES': max_entries}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -94,7 +186,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageLimitPagination',
 }
@@ -114,6 +206,22 @@ DJOSER = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Бюджеты SQL-запросов на эндпоинт (ViewSet.action); превышения
+# пишутся в лог api.metrics.
+QUERY_BUDGET_DEFAULT = int(os.getenv('QUERY_BUDGET_DEFAULT', 20))
+QUERY_BUDGETS = {
+    'TagViewSet.list': 2,
+    'IngredientViewSet.list': 2,
+    'RecipeViewSet.list': 8,
+    'RecipeViewSet.retrieve': 8,
+    'Subscriptions.get': 6,
+}
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split()
+
+# thread, process или sync (обработка в потоке запроса).
+IMAGE_PROCESSING_BACKEND = os.getenv('IMAGE_PROCESSING_BACKEND', 'thread')
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
+
 LANGUAGE_CODE = 'ru-RU'
 
 TIME_ZONE = 'UTC'
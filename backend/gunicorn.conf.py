@@ -0,0 +1,14 @@
+import os
+
+# DJANGO_ASGI=True запускает foodgram.asgi под воркерами uvicorn:
+# один процесс обслуживает много одновременных запросов на чтение.
+ASGI = os.getenv('DJANGO_ASGI', 'False') == 'True'
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+if ASGI:
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
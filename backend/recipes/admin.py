@@ -29,17 +29,13 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'author',
+        'favorites_count',
         'show_image',
     )
     list_filter = ('author', 'name', 'tags')
     list_display_links = ('name',)
     inlines = [RecipeIngredientInline]
-    readonly_fields = ('favorite_count', 'show_image')
-
-    def favorite_count(self, obj):
-        return obj.favorites.count()
-
-    favorite_count.short_description = 'В избранном'
+    readonly_fields = ('favorites_count', 'show_image')
 
     def show_image(self, obj):
         if obj.image:
@@ -0,0 +1,138 @@
+import io
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps, features
+
+from api.cache import bump_version
+from foodgram import constants
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'image_thumbnail': constants.IMAGE_THUMBNAIL_SIZE,
+    'image_card': constants.IMAGE_CARD_SIZE,
+}
+
+executor = None
+executor_lock = threading.Lock()
+
+
+def init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            workers = settings.IMAGE_PROCESSING_WORKERS
+            if settings.IMAGE_PROCESSING_BACKEND == 'process':
+                executor = ProcessPoolExecutor(
+                    max_workers=workers, initializer=init_worker
+                )
+            else:
+                executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='recipe-images'
+                )
+    return executor
+
+
+def encode_rendition(image, size):
+    rendition = image.copy()
+    rendition.thumbnail(size)
+    buffer = io.BytesIO()
+    if features.check('webp'):
+        rendition.save(
+            buffer, 'WEBP', quality=constants.IMAGE_RENDITION_QUALITY
+        )
+        return buffer.getvalue(), 'webp'
+    rendition.convert('RGB').save(
+        buffer,
+        'JPEG',
+        quality=constants.IMAGE_RENDITION_QUALITY,
+        optimize=True,
+    )
+    return buffer.getvalue(), 'jpg'
+
+
+def render_renditions(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return False
+    source_name = recipe.image.name
+    with recipe.image.open('rb') as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    renditions = {}
+    for field_name, size in RENDITIONS.items():
+        content, extension = encode_rendition(image, size)
+        field = Recipe._meta.get_field(field_name)
+        name = field.generate_filename(
+            recipe, f'{Path(source_name).stem}.{extension}'
+        )
+        renditions[field_name] = field.storage.save(
+            name, ContentFile(content)
+        )
+    # Изображение могли заменить, пока шла обработка.
+    if Recipe.objects.filter(pk=recipe_id, image=source_name).update(
+        **renditions
+    ):
+        return True
+    delete_renditions(renditions.values())
+    return False
+
+
+def delete_renditions(names):
+    for field_name, name in zip(RENDITIONS, names):
+        if name:
+            Recipe._meta.get_field(field_name).storage.delete(name)
+
+
+def process_in_worker(recipe_id):
+    try:
+        return render_renditions(recipe_id)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', recipe_id)
+        return False
+    finally:
+        connections.close_all()
+
+
+def invalidate_recipe(recipe_id):
+    # Версии сбрасываются в основном процессе: локальный кеш
+    # воркера процессов не виден веб-приложению.
+    bump_version(f'recipe:{recipe_id}')
+    bump_version('recipes')
+
+
+def on_renditions_done(recipe_id, future):
+    if not future.cancelled() and future.result():
+        invalidate_recipe(recipe_id)
+
+
+def run_sync(recipe_id):
+    if render_renditions(recipe_id):
+        invalidate_recipe(recipe_id)
+
+
+def submit_renditions(recipe_id):
+    future = get_executor().submit(process_in_worker, recipe_id)
+    future.add_done_callback(partial(on_renditions_done, recipe_id))
+
+
+def schedule_renditions(recipe):
+    if settings.IMAGE_PROCESSING_BACKEND == 'sync':
+        transaction.on_commit(lambda: run_sync(recipe.pk))
+        return
+    transaction.on_commit(lambda: submit_renditions(recipe.pk))
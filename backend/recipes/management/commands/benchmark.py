@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from benchmark.scenarios import SCENARIOS, BenchmarkContext, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет сценарии API на данных benchmark_data и выводит '
+        'p50/p95, пропускную способность и число SQL-запросов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS
+        )
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path')
+
+    def handle(self, *args, **options):
+        try:
+            context = BenchmarkContext(options['seed'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        self.stdout.write(
+            f'База: {connection.vendor}, итераций: {options["iterations"]}'
+        )
+        self.stdout.write(
+            f'{"сценарий":<16}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"зап/с":>10}{"SQL ср.":>10}{"SQL макс.":>11}'
+        )
+        results = []
+        for scenario in options['scenario'] or SCENARIOS:
+            try:
+                result = run(
+                    context,
+                    scenario,
+                    options['iterations'],
+                    options['warmup'],
+                )
+            except ValueError as error:
+                raise CommandError(error)
+            results.append(result)
+            self.stdout.write(
+                f'{scenario:<16}{result["p50_ms"]:>10.1f}'
+                f'{result["p95_ms"]:>10.1f}'
+                f'{result["throughput_rps"]:>10.1f}'
+                f'{result["queries_avg"]:>10.1f}'
+                f'{result["queries_max"]:>11}'
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump(
+                    {'vendor': connection.vendor, 'results': results},
+                    file,
+                    ensure_ascii=False,
+                    indent=2,
+                )
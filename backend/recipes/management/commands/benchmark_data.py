@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from benchmark.data import generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетических пользователей, рецепты, избранное, '
+        'подписки и списки покупок для бенчмарка.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--subscriptions', type=int, default=10)
+        parser.add_argument('--cart', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        users, recipes = generate(
+            users=options['users'],
+            recipes=options['recipes'],
+            favorites=options['favorites'],
+            subscriptions=options['subscriptions'],
+            cart=options['cart'],
+            seed=options['seed'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Создано пользователей: {users}, рецептов: {recipes}.'
+            )
+        )
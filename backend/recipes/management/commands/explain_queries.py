@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Sum
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выводит планы выполнения основных запросов API. Запустите до и '
+        'после миграции, чтобы сравнить использование индексов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true')
+
+    def get_querysets(self):
+        user = User.objects.order_by('pk').first()
+        querysets = {
+            'Лента рецептов': Recipe.objects.all()[:20],
+            'Рецепты автора': Recipe.objects.filter(
+                author=user
+            ).order_by('-pub_date')[:20],
+            'Фильтр по тегу': Recipe.objects.filter(
+                Exists(
+                    Recipe.tags.through.objects.filter(
+                        recipe=OuterRef('pk'), tag__slug='breakfast'
+                    )
+                )
+            )[:20],
+            'Поиск ингредиента': Ingredient.objects.filter(
+                name__istartswith='мол'
+            ),
+            'Поиск ингредиента по подстроке': Ingredient.objects.filter(
+                name__icontains='мол'
+            ),
+        }
+        if user:
+            querysets['Избранное'] = Recipe.objects.filter(
+                id__in=user.favorites.values('recipe__id')
+            )[:20]
+            querysets['Сводка списка покупок'] = (
+                RecipeIngredient.objects.filter(
+                    recipe__shopping_list__user=user
+                )
+                .values('ingredient__name', 'ingredient__measurement_unit')
+                .annotate(
+                    amount=Sum('amount'),
+                    name=F('ingredient__name'),
+                )
+            )
+        return querysets
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options = {'analyze': True, 'buffers': True}
+        for title, queryset in self.get_querysets().items():
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
@@ -1,22 +1,126 @@
+import csv
 import json
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from api.cache import bump_version
 from recipes.models import Ingredient, Tag
 
+DEFAULT_PATHS = (
+    settings.BASE_DIR.parent / 'data' / 'ingredients.json',
+    settings.BASE_DIR / 'demo_data' / 'ingredients.json',
+)
+READ_CHUNK_SIZE = 64 * 1024
+TAGS = (
+    {'name': 'Завтрак', 'color': '#FFA500', 'slug': 'breakfast'},
+    {'name': 'Обед', 'color': '#228B22', 'slug': 'lunch'},
+    {'name': 'Ужин', 'color': '#483D8B', 'slug': 'dinner'},
+)
+
+
+def iter_json(file):
+    # Потоковый разбор JSON-массива без загрузки файла целиком.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise CommandError('Ожидается JSON-массив.')
+            buffer = buffer[1:]
+            started = True
+            continue
+        if started and buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Некорректный JSON-файл.')
+            chunk = file.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield item['name'], item['measurement_unit']
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+READERS = {'json': iter_json, 'csv': iter_csv}
+
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из JSON или CSV и создаёт базовые теги.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=Path)
+        parser.add_argument('--format', choices=READERS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
     def handle(self, *args, **options):
-        # Загрузка ингридиентов в БД.
-        with open(r'demo_data/ingredients.json', encoding='utf-8') as jsonfile:
-            ingredients = json.load(jsonfile)
-            for ingredient in ingredients:
-                Ingredient.objects.create(
-                    name=ingredient['name'],
-                    measurement_unit=ingredient['measurement_unit'],
+        path = options['path'] or next(
+            (path for path in DEFAULT_PATHS if path.exists()),
+            DEFAULT_PATHS[0],
+        )
+        file_format = options['format'] or path.suffix.lstrip('.')
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if not path.exists():
+            raise CommandError(f'Файл не найден: {path}')
+
+        start = time.perf_counter()
+        rows = 0
+        ingredients_before = Ingredient.objects.count()
+        with transaction.atomic(), open(path, encoding='utf-8') as file:
+            # Загрузка ингридиентов в БД пачками.
+            reader = READERS[file_format](file)
+            while batch := list(islice(reader, options['batch_size'])):
+                Ingredient.objects.bulk_create(
+                    [
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in batch
+                    ],
+                    ignore_conflicts=True,
+                )
+                rows += len(batch)
+
+            # Создание тегов для рецепта.
+            Tag.objects.bulk_create(
+                [Tag(**tag) for tag in TAGS], ignore_conflicts=True
+            )
+        elapsed = time.perf_counter() - start
+
+        bump_version('ingredients')
+        bump_version('tags')
+        if isinstance(caches['default'], (LocMemCache, DummyCache)):
+            self.stdout.write(
+                self.style.WARNING(
+                    'Кеш по умолчанию не общий для процессов: запущенные '
+                    'серверы увидят новые справочники только после '
+                    'перезапуска.'
                 )
+            )
 
-        # Создание тегов для рецепта.
-        Tag.objects.create(name='Завтрак', color='#FFA500', slug='breakfast')
-        Tag.objects.create(name='Обед', color='#228B22', slug='lunch')
-        Tag.objects.create(name='Ужин', color='#483D8B', slug='dinner')
+        created = Ingredient.objects.count() - ingredients_before
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Обработано строк: {rows}, добавлено ингредиентов: '
+                f'{created} за {elapsed:.2f} с '
+                f'({rows / elapsed if elapsed else rows:.0f} строк/с).'
+            )
+        )
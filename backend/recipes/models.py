@@ -1,10 +1,11 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
-from django.db.models import Q, F
+from django.db import models, transaction
+from django.db.models import Q, F, Sum
 
 from foodgram import constants
+from foodgram.db.models import CounterFieldsMixin
 
 User = get_user_model()
 
@@ -57,7 +58,9 @@ class Ingredient(models.Model):
         return f'{self.name} [{self.measurement_unit}]'
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
+    counter_fields = ('favorites_count', 'shopping_cart_count')
+
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
@@ -74,6 +77,18 @@ class Recipe(models.Model):
         blank=False,
         null=False,
     )
+    image_thumbnail = models.ImageField(
+        verbose_name='Миниатюра',
+        upload_to='recipe_images/thumbnails/',
+        blank=True,
+        editable=False,
+    )
+    image_card = models.ImageField(
+        verbose_name='Изображение для карточки',
+        upload_to='recipe_images/cards/',
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(verbose_name='Описание рецепта')
     tags = models.ManyToManyField(
         Tag,
@@ -103,11 +118,31 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-pub_date', 'id'],
+                name='recipe_pub_date_id_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -151,6 +186,13 @@ class RecipeIngredient(models.Model):
     class Meta:
         verbose_name = 'Ингридиенты в рецепте'
         verbose_name_plural = 'Ингридиенты в рецепте'
+        indexes = [
+            models.Index(
+                fields=['recipe', 'ingredient'],
+                include=['amount'],
+                name='recipe_ingredient_amount_idx',
+            ),
+        ]
 
 
 class Subscription(models.Model):
@@ -239,3 +281,85 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipe}" в Список покупок.'
+
+
+class ShoppingCartItemManager(models.Manager):
+    def rebuild(self, user_ids=None, ingredient_ids=None):
+        # Строки пересчитываются из текущего состояния, поэтому порядок
+        # удаления при каскаде не влияет на результат.
+        items = self.all()
+        lookups = {'recipe__shopping_list__isnull': False}
+        if user_ids is not None:
+            user_ids = sorted(set(user_ids))
+            if not user_ids:
+                return
+            items = items.filter(user_id__in=user_ids)
+            lookups['recipe__shopping_list__user__in'] = user_ids
+        if ingredient_ids is not None:
+            ingredient_ids = list(ingredient_ids)
+            if not ingredient_ids:
+                return
+            items = items.filter(ingredient_id__in=ingredient_ids)
+            lookups['ingredient__in'] = ingredient_ids
+        aggregated = (
+            RecipeIngredient.objects.filter(**lookups)
+            .values('recipe__shopping_list__user', 'ingredient')
+            .annotate(total_amount=Sum('amount'))
+        )
+
+        with transaction.atomic():
+            if user_ids is not None:
+                # Параллельные пересчёты корзины одного пользователя
+                # выполняются по очереди.
+                list(
+                    User.objects.select_for_update()
+                    .filter(pk__in=user_ids)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)
+                )
+            items.delete()
+            self.bulk_create(
+                (
+                    self.model(
+                        user_id=item['recipe__shopping_list__user'],
+                        ingredient_id=item['ingredient'],
+                        total_amount=item['total_amount'],
+                    )
+                    for item in aggregated.iterator()
+                ),
+                batch_size=1000,
+            )
+
+
+class ShoppingCartItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_items',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_items',
+        verbose_name='Ингридиент',
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество',
+        default=0,
+    )
+
+    objects = ShoppingCartItemManager()
+
+    class Meta:
+        verbose_name = 'Ингридиент в списке покупок'
+        verbose_name_plural = 'Ингридиенты в списке покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} — {self.total_amount}'
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.models import (
+    Favorite,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCartItem,
+    ShoppingList,
+    Subscription,
+)
+
+User = get_user_model()
+
+# Связь, счётчик на связанной модели.
+COUNTERS = {
+    Recipe: ('author_id', User, 'recipes_count'),
+    Favorite: ('recipe_id', Recipe, 'favorites_count'),
+    ShoppingList: ('recipe_id', Recipe, 'shopping_cart_count'),
+    Subscription: ('author_id', User, 'subscribers_count'),
+}
+TRACKED_FIELDS = {
+    Recipe: ('author_id',),
+    Favorite: ('recipe_id',),
+    ShoppingList: ('user_id', 'recipe_id'),
+    Subscription: ('author_id',),
+    RecipeIngredient: ('ingredient_id',),
+}
+
+
+def get_previous(instance, field):
+    return getattr(instance, '_previous', {}).get(field)
+
+
+def change_counter(model, pk, field, delta):
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        # Счётчик мог быть уже пересчитан командой recount_counters.
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    queryset.update(**{field: F(field) + delta})
+
+
+def remember_previous(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._previous = {}
+    if instance.pk is not None:
+        instance._previous = (
+            sender.objects.filter(pk=instance.pk)
+            .values(*TRACKED_FIELDS[sender])
+            .first()
+            or {}
+        )
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    relation, model, field = COUNTERS[sender]
+    current = getattr(instance, relation)
+    previous = None if created else get_previous(instance, relation)
+    if not created and (previous is None or previous == current):
+        return
+    if previous is not None:
+        change_counter(model, previous, field, -1)
+    change_counter(model, current, field, 1)
+
+
+def count_deleted(sender, instance, **kwargs):
+    relation, model, field = COUNTERS[sender]
+    change_counter(model, getattr(instance, relation), field, -1)
+
+
+# Подключение по отправителю: обработчик без sender отключил бы быстрое
+# удаление для всех моделей проекта.
+for sender in TRACKED_FIELDS:
+    pre_save.connect(remember_previous, sender=sender)
+for sender in COUNTERS:
+    post_save.connect(count_created, sender=sender)
+    post_delete.connect(count_deleted, sender=sender)
+
+
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+def rebuild_shopping_cart(sender, instance, **kwargs):
+    user_ids = {instance.user_id}
+    previous_user_id = get_previous(instance, 'user_id')
+    if previous_user_id is not None:
+        user_ids.add(previous_user_id)
+    ShoppingCartItem.objects.rebuild(user_ids)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def rebuild_recipe_ingredient(sender, instance, **kwargs):
+    ingredient_ids = {instance.ingredient_id}
+    previous_ingredient_id = get_previous(instance, 'ingredient_id')
+    if previous_ingredient_id is not None:
+        ingredient_ids.add(previous_ingredient_id)
+    # Рецепт мог быть уже удалён каскадом вместе со списком покупок.
+    user_ids = ShoppingList.objects.filter(
+        recipe_id=instance.recipe_id
+    ).values_list('user_id', flat=True)
+    ShoppingCartItem.objects.rebuild(user_ids, ingredient_ids)
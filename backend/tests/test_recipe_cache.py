@@ -0,0 +1,162 @@
+import base64
+import io
+import json
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APIClient, APITransactionTestCase
+
+from recipes.models import Ingredient, Tag
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'tests-{alias}',
+    }
+    for alias in ('default', 'fragments', 'responses')
+}
+
+
+def make_image(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (20, 20), color).save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+@override_settings(
+    CACHES=CACHES,
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_PROCESSING_BACKEND='sync',
+)
+class RecipeCacheInvalidationTests(APITransactionTestCase):
+    # Версии сбрасываются в on_commit, поэтому нужны настоящие коммиты.
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        for alias in CACHES:
+            caches[alias].clear()
+        self.author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Автор',
+            last_name='Рецептов',
+            password='author-password',
+        )
+        self.reader = User.objects.create_user(
+            email='reader@example.com',
+            username='reader',
+            first_name='Читатель',
+            last_name='Рецептов',
+            password='reader-password',
+        )
+        self.tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#FFA500', 'breakfast'),
+                ('Обед', '#00FF00', 'lunch'),
+            )
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'сахар')
+        ]
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+        self.reader_client = APIClient()
+        self.reader_client.force_authenticate(self.reader)
+        self.anonymous_client = APIClient()
+
+        response = self.author_client.post(
+            '/api/recipes/',
+            self.get_payload(amount=10, image=make_image('red')),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.recipe_id = response.data['id']
+        self.detail_url = f'/api/recipes/{self.recipe_id}/'
+
+    def get_payload(self, amount=10, tags=None, image=None):
+        payload = {
+            'tags': [tag.id for tag in tags or self.tags[:1]],
+            'ingredients': [
+                {'id': self.ingredients[0].id, 'amount': amount},
+            ],
+        }
+        if image is not None:
+            payload.update(
+                image=image,
+                name='Блины',
+                text='Смешать и пожарить.',
+                cooking_time=20,
+            )
+        return payload
+
+    def read_all(self):
+        # Свежие ответы для авторизованного и анонимного клиента,
+        # детально и в списке.
+        results = []
+        for client in (self.reader_client, self.anonymous_client):
+            detail = client.get(self.detail_url)
+            listing = client.get('/api/recipes/?limit=10')
+            self.assertEqual(detail.status_code, 200)
+            self.assertEqual(listing.status_code, 200)
+            results.append(json.loads(detail.content))
+            results.extend(
+                recipe
+                for recipe in json.loads(listing.content)['results']
+                if recipe['id'] == self.recipe_id
+            )
+        self.assertEqual(len(results), 4)
+        return results
+
+    def patch(self, payload):
+        self.read_all()
+        response = self.author_client.patch(
+            self.detail_url, payload, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_anonymous_reads_are_cached(self):
+        self.read_all()
+        response = self.anonymous_client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_patch_amount_is_visible_everywhere(self):
+        data = self.patch(self.get_payload(amount=99))
+
+        self.assertEqual(data['ingredients'][0]['amount'], 99)
+        for recipe in self.read_all():
+            self.assertEqual(recipe['ingredients'][0]['amount'], 99)
+
+    def test_patch_tags_is_visible_everywhere(self):
+        data = self.patch(self.get_payload(tags=self.tags))
+
+        expected = sorted(tag.id for tag in self.tags)
+        self.assertEqual(sorted(tag['id'] for tag in data['tags']), expected)
+        for recipe in self.read_all():
+            self.assertEqual(
+                sorted(tag['id'] for tag in recipe['tags']), expected
+            )
+
+    def test_patch_image_is_visible_everywhere(self):
+        before = self.read_all()[0]
+
+        self.patch(self.get_payload(image=make_image('blue')))
+
+        for recipe in self.read_all():
+            self.assertEqual(recipe['name'], 'Блины')
+            self.assertNotEqual(recipe['image'], before['image'])
+            self.assertIsNotNone(recipe['image_card'])
+            self.assertNotEqual(recipe['image_card'], before['image_card'])
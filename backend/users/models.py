@@ -3,11 +3,13 @@ from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 
 from foodgram import constants
+from foodgram.db.models import CounterFieldsMixin
 
 
-class CustomUser(AbstractUser):
+class CustomUser(CounterFieldsMixin, AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    counter_fields = ('recipes_count', 'subscribers_count')
     email = models.EmailField(
         verbose_name='Электронная почта',
         unique=True,
@@ -30,6 +32,16 @@ class CustomUser(AbstractUser):
         verbose_name='Пароль',
         max_length=constants.USER_CHAR_FIELD_MAX_LENGTH,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Пользователь'